@@ -2,10 +2,13 @@
 using require/ensure, which allows randomised tests to find errors and will fail
 if other code tries to use it incorrectly (in debug mode at least). """
 
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
+import numpy as np
 from icontract import require, ensure
 
+from .instance import CrossDockSolution
+
 
 def unique(gen):
     """ For testing. Don't worry about efficiency, just make sure it doesn't
@@ -119,3 +122,129 @@ def single_tour_heuristic(instance):
             order = new_order
 
     return local_search(order)
+
+
+@require(lambda path, distance_matrix: distance_matrix.shape == (len(path),) * 2)
+@ensure(lambda path, result: result[0] == path[0] and result[-1] == path[-1])
+@ensure(lambda path, result: sorted(result) == sorted(path))
+def two_opt(path, distance_matrix):
+    """ Improve an open path by reversing segments, keeping both endpoints fixed,
+    until no reversal shortens it. distance_matrix[a, b] is the distance between
+    path[a] and path[b], and must be symmetric (so that reversing a segment only
+    changes the two arcs at its ends). All reversals starting at one position
+    are evaluated in a single vectorised step. """
+    order = np.arange(len(path))
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, len(order) - 2):
+            # Reversing order[i:j + 1] for all j > i replaces arcs a-b and c-e
+            # with a-c and b-e.
+            a, b = order[i - 1], order[i]
+            c, e = order[i + 1 : -1], order[i + 2 :]
+            delta = (
+                distance_matrix[a, c]
+                + distance_matrix[b, e]
+                - distance_matrix[a, b]
+                - distance_matrix[c, e]
+            )
+            best = np.argmin(delta)
+            if delta[best] < -1e-9:
+                order[i : i + best + 2] = order[i : i + best + 2][::-1]
+                improved = True
+    return [path[k] for k in order]
+
+
+def split_path(path, crossdock_node=0):
+    """ Split a truck path into its pre-dock visits, post-dock visits (neither
+    including the warehouse or crossdock) and whether the truck docks. """
+    if crossdock_node in path:
+        dock = path.index(crossdock_node)
+        return path[1:dock], path[dock + 1 : -1], True
+    return path[1:-1], [], False
+
+
+def join_path(warehouse_node, pre, post, docks, crossdock_node=0):
+    """ Reverse of split_path. """
+    if docks:
+        return [warehouse_node] + pre + [crossdock_node] + post + [warehouse_node]
+    return [warehouse_node] + pre + [warehouse_node]
+
+
+@ensure(lambda node, result: result.count(node) == 1)
+@ensure(lambda path, result: result[0] == path[0] and result[-1] == path[-1])
+def cheapest_insertion(path, node, distance):
+    """ Insert node between the fixed endpoints of path where it adds the least
+    distance. distance(i, i) is never called. """
+
+    def cost(i, j):
+        return 0.0 if i == j else distance(i, j)
+
+    position = min(
+        range(1, len(path)),
+        key=lambda k: cost(path[k - 1], node)
+        + cost(node, path[k])
+        - cost(path[k - 1], path[k]),
+    )
+    return path[:position] + [node] + path[position:]
+
+
+def _unique(nodes):
+    """ Drop repeated nodes, keeping the first visit. """
+    return list(dict.fromkeys(nodes))
+
+
+def repair_solution(instance, paths: Dict[int, List[int]]) -> CrossDockSolution:
+    """ Turn rough truck paths (e.g. stitched together from the results of
+    subproblems) into a feasible solution, keeping as much of their structure
+    as possible. Dock decisions are kept. Each node is visited post-dock at most
+    once (by the first truck in warehouse order), and only if a docked warehouse
+    demands it. Pre-dock visits are kept only if they serve the truck's own
+    demand which isn't already served post-dock. Anything left unserved is
+    added to the warehouse's own pre-dock route by cheapest insertion. """
+    crossdock_node = instance.crossdock_node
+    parts = {
+        warehouse_node: split_path(
+            paths.get(warehouse_node, [warehouse_node, warehouse_node]),
+            crossdock_node,
+        )
+        for warehouse_node in instance.warehouse_nodes
+    }
+    docked = {
+        warehouse_node for warehouse_node, (_, _, docks) in parts.items() if docks
+    }
+    post_demand = {
+        node
+        for warehouse_node in docked
+        for node in instance.warehouse_demand[warehouse_node]
+    }
+    post_routes = {}
+    served_post = set()
+    for warehouse_node, (_, post, _) in parts.items():
+        post_routes[warehouse_node] = [
+            node
+            for node in _unique(post)
+            if node in post_demand and node not in served_post
+        ]
+        served_post.update(post_routes[warehouse_node])
+    result = {}
+    for warehouse_node, (pre, _, docks) in parts.items():
+        needed = set(instance.warehouse_demand[warehouse_node])
+        if docks:
+            needed -= served_post
+        route = [warehouse_node] + [node for node in _unique(pre) if node in needed]
+        route.append(crossdock_node if docks else warehouse_node)
+        for node in sorted(needed - set(route)):
+            route = cheapest_insertion(route, node, instance.distance)
+        if len(route) == 2 and not docks:
+            # Nothing to do, but the truck still has to go somewhere. It has no
+            # demand, so docking cannot change which demand counts as served.
+            docks, route = True, [warehouse_node, crossdock_node]
+        result[warehouse_node] = join_path(
+            warehouse_node,
+            route[1:-1],
+            post_routes[warehouse_node],
+            docks,
+            crossdock_node,
+        )
+    return CrossDockSolution(result)
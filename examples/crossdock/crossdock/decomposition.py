@@ -0,0 +1,197 @@
+"""
+Lagrangian decomposition of the crossdock model into one routing subproblem per
+truck, with the subproblems solved in parallel worker processes.
+Public API:
+    solve_decomposed(instance) -> best solution found, its cost and a lower bound
+
+Trucks are coupled only through the demand constraints: demand d of warehouse w
+is served pre-dock by truck w, or post-dock by any truck t if truck w docks.
+Writing z[t, w, d] for "truck t serves demand d of warehouse w post-dock":
+    pre[w, d] + sum_t z[t, w, d] == 1    (multiplier lam[w, d], free)
+    z[t, w, d] <= dock[w]                (multiplier mu[t, w, d] >= 0)
+    z[t, w, d] <= post[t, d]             (kept in the subproblem)
+Relaxing the first two leaves an independent prize-collecting routing problem
+for each truck t, with prize lam[t, d] for a pre-dock visit to its own demand
+d, prize sum_w max(0, lam[w, d] - mu[t, w, d]) for a post-dock visit to d, and
+prize sum_{t', d} mu[t', t, d] for docking. The sum of the subproblem
+bounds plus sum(lam) is a lower bound for any multipliers. Multipliers are
+improved by subgradient steps, and each round of subproblem routes is repaired
+into a feasible incumbent.
+"""
+
+import concurrent.futures
+import dataclasses
+import logging
+import multiprocessing
+import time
+
+import numpy as np
+
+from .algorithms import repair_solution, split_path
+from .evaluation import evaluate
+from .instance import CrossDockInstance, CrossDockSolution
+from .model import (
+    FullModel,
+    _add_disallowed_arc_constraints,
+    _add_flow_constraints,
+    _initialise_variables,
+    solve_model,
+)
+
+
+__all__ = ["solve_decomposed"]
+
+
+@dataclasses.dataclass
+class DecompositionResult:
+
+    solution: CrossDockSolution
+    objective: float
+    bound: float
+    iterations: int
+
+
+def _construct_subproblem(
+    instance, warehouse_node, pre_prizes, post_prizes, dock_prize
+):
+    """ Routing model for a single truck, built from the same pieces as the full
+    model. The truck may visit any demand node in either phase; prizes for
+    visits are subtracted from the cost of arcs into the visited node. """
+    truck_instance = CrossDockInstance(
+        warehouse_demand={warehouse_node: sorted(instance.all_demand_nodes)},
+        distances=instance.distances,
+    )
+    model, arc_variables, dock_variables = _initialise_variables(truck_instance)
+    _add_flow_constraints(truck_instance, model, arc_variables, dock_variables)
+    _add_disallowed_arc_constraints(truck_instance, model, arc_variables)
+    for phase, prizes in [("pre", pre_prizes), ("post", post_prizes)]:
+        for (i, j), var in arc_variables[phase][warehouse_node].items():
+            var.Obj = var.Obj - prizes.get(j, 0.0)
+    dock_variables[warehouse_node].Obj = -dock_prize
+    model.update()
+    return FullModel(
+        instance=truck_instance,
+        gurobi_model=model,
+        arc_variables=arc_variables,
+        dock_variables=dock_variables,
+    )
+
+
+def _solve_subproblem(instance, warehouse_node, pre_prizes, post_prizes, dock_prize):
+    """ Runs in a worker process. Returns the subproblem's bound (which is what
+    counts towards the lower bound) and the truck's path. """
+    model = _construct_subproblem(
+        instance, warehouse_node, pre_prizes, post_prizes, dock_prize
+    )
+    model.gurobi_model.params.OutputFlag = 0
+    solution = solve_model(model, threads=1)
+    bound = model.gurobi_model.ObjBound
+    model.gurobi_model.dispose()
+    return bound, solution.paths[warehouse_node]
+
+
+def solve_decomposed(
+    instance,
+    *,
+    workers=None,
+    mip_gap=1e-4,
+    time_limit=None,
+    max_iterations=100,
+    step_scale=2.0,
+    patience=5,
+):
+    """ Subgradient optimisation of the Lagrangian dual, with the truck
+    subproblems of each iteration solved in parallel by a pool of worker
+    processes. Stops when the relative gap between the best incumbent and the
+    best bound is within mip_gap, or at the iteration or time limit. The step
+    scale is halved whenever the bound fails to improve for patience
+    iterations. """
+    start = time.monotonic()
+    trucks = list(instance.warehouse_nodes)
+    pairs = [(w, d) for w in trucks for d in instance.warehouse_demand[w]]
+    owner = np.array([trucks.index(w) for w, _ in pairs], dtype=np.int64)
+    lam = np.zeros(len(pairs))
+    mu = np.zeros((len(trucks), len(pairs)))
+    best_solution, best_objective, best_bound = None, np.inf, -np.inf
+    since_improved, iteration = 0, 0
+
+    # Spawned (not forked) workers, so each one gets a fresh Gurobi environment.
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(workers, mp_context=context) as pool:
+        while iteration < max_iterations:
+            iteration += 1
+            post_value = np.maximum(lam[np.newaxis, :] - mu, 0.0)
+            futures = []
+            for t, warehouse_node in enumerate(trucks):
+                pre_prizes, post_prizes = {}, {}
+                for p, (w, d) in enumerate(pairs):
+                    if w == warehouse_node:
+                        pre_prizes[d] = lam[p]
+                    post_prizes[d] = post_prizes.get(d, 0.0) + post_value[t, p]
+                dock_prize = mu[:, owner == t].sum()
+                futures.append(
+                    pool.submit(
+                        _solve_subproblem,
+                        instance,
+                        warehouse_node,
+                        pre_prizes,
+                        post_prizes,
+                        dock_prize,
+                    )
+                )
+            results = [future.result() for future in futures]
+            paths = {w: path for w, (_, path) in zip(trucks, results)}
+
+            bound = sum(bound for bound, _ in results) + lam.sum()
+            if bound > best_bound + 1e-9:
+                best_bound, since_improved = bound, 0
+            else:
+                since_improved += 1
+                if since_improved >= patience:
+                    step_scale, since_improved = step_scale / 2, 0
+
+            solution = repair_solution(instance, paths)
+            result = evaluate(instance, solution)
+            assert result.feasible, result.violations
+            if result.total_cost < best_objective:
+                best_solution, best_objective = solution, result.total_cost
+
+            gap = (best_objective - best_bound) / max(abs(best_objective), 1e-10)
+            logging.info(
+                f"Iteration {iteration}: bound {bound:.4f} (best {best_bound:.4f}) "
+                f"incumbent {best_objective:.4f} gap {gap:.2%}"
+            )
+            if gap <= mip_gap:
+                break
+            if time_limit is not None and time.monotonic() - start >= time_limit:
+                break
+
+            # Subgradients of the relaxed constraints at the subproblem routes.
+            pre_visited = np.zeros(len(pairs))
+            post_visited = np.zeros((len(trucks), len(pairs)))
+            for t, warehouse_node in enumerate(trucks):
+                pre, post, _ = split_path(paths[warehouse_node])
+                for p, (w, d) in enumerate(pairs):
+                    pre_visited[p] += w == warehouse_node and d in pre
+                    post_visited[t, p] = d in post
+            docked = np.array([instance.crossdock_node in paths[w] for w in trucks])
+            z = post_visited * (lam[np.newaxis, :] - mu > 0)
+            lam_grad = 1 - pre_visited - z.sum(axis=0)
+            mu_grad = z - docked[owner][np.newaxis, :]
+            # Projected: mu already at zero can't be moved further down.
+            mu_grad[(mu <= 0) & (mu_grad < 0)] = 0.0
+            norm = (lam_grad * lam_grad).sum() + (mu_grad * mu_grad).sum()
+            if norm == 0:
+                # Relaxed constraints are satisfied with complementary slackness,
+                # so there's nothing further to gain from the multipliers.
+                break
+            step = step_scale * (best_objective - bound) / norm
+            lam = lam + step * lam_grad
+            mu = np.maximum(mu + step * mu_grad, 0.0)
+
+    return DecompositionResult(
+        solution=best_solution,
+        objective=best_objective,
+        bound=best_bound,
+        iterations=iteration,
+    )
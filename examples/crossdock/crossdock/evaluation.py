@@ -0,0 +1,234 @@
+"""
+Cost evaluation and feasibility checking of crossdock solutions, independent of
+the MIP model. Paths are flattened into index arrays so that a whole batch of
+solutions is costed and checked with a handful of numpy operations instead of
+walking every path in python.
+Public API:
+    evaluate_batch(instance, solutions) -> costs and violations for each solution
+    evaluate(instance, solution) -> costs and violations for a single solution
+
+The feasibility rules are the ones encoded in the model:
+    * every warehouse truck has a path which starts and ends at its warehouse,
+      and never visits any other warehouse;
+    * a truck visits the crossdock at most once, splitting its path into pre- and
+      post-dock phases, and visits each node at most once per phase;
+    * each demand of each warehouse is served exactly once: either pre-dock by
+      the warehouse's own truck, or post-dock by any truck, provided that the
+      warehouse's truck also visits the crossdock.
+"""
+
+import dataclasses
+import itertools
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from .instance import CrossDockInstance, CrossDockSolution
+
+__all__ = ["evaluate", "evaluate_batch"]
+
+
+@dataclasses.dataclass
+class SolutionEvaluation:
+
+    total_cost: float
+    truck_costs: Dict[int, float]
+    violations: List[str]
+
+    @property
+    def feasible(self) -> bool:
+        return not self.violations
+
+
+@dataclasses.dataclass
+class BatchEvaluation:
+    """ Results for a batch of solutions. Costs are arrays indexed by solution
+    (and by warehouse, in the order of warehouse_nodes, for truck costs). Cost
+    is nan for any truck whose path includes a node not in the instance. """
+
+    warehouse_nodes: List[int]
+    total_cost: np.ndarray
+    truck_cost: np.ndarray
+    violations: List[List[str]]
+
+    @property
+    def feasible(self) -> np.ndarray:
+        return np.array([not violations for violations in self.violations], dtype=bool)
+
+    def __len__(self):
+        return len(self.violations)
+
+    def __getitem__(self, index) -> SolutionEvaluation:
+        return SolutionEvaluation(
+            total_cost=float(self.total_cost[index]),
+            truck_costs={
+                warehouse_node: float(cost)
+                for warehouse_node, cost in zip(
+                    self.warehouse_nodes, self.truck_cost[index]
+                )
+            },
+            violations=list(self.violations[index]),
+        )
+
+
+def evaluate_batch(
+    instance: CrossDockInstance, solutions: Sequence[CrossDockSolution]
+) -> BatchEvaluation:
+    """ Compute per-truck and total cost of every solution, and check each one
+    against every feasibility rule of the instance. All paths of all solutions
+    are evaluated together, so prefer one call with a large batch over many
+    calls with a single solution. """
+    warehouse_nodes = list(instance.warehouse_nodes)
+    nsolutions, nwarehouses = len(solutions), len(warehouse_nodes)
+    labels = sorted(instance.all_nodes)
+    label_index = {label: i for i, label in enumerate(labels)}
+    nlabels = len(labels)
+    matrix = instance.distances.distance_matrix(labels)
+    violations = [[] for _ in solutions]
+
+    for s, solution in enumerate(solutions):
+        for node in solution.paths.keys() - set(warehouse_nodes):
+            violations[s].append(f"Path given for {node}, which is not a warehouse")
+
+    # Flatten all paths into one array of node indices (-1 for labels not in
+    # the instance). Path number p is truck p % nwarehouses of solution
+    # p // nwarehouses; missing paths are empty.
+    paths = [
+        solution.paths.get(warehouse_node, [])
+        for solution in solutions
+        for warehouse_node in warehouse_nodes
+    ]
+    lengths = np.array([len(path) for path in paths], dtype=np.int64)
+    index = np.fromiter(
+        (label_index.get(node, -1) for node in itertools.chain.from_iterable(paths)),
+        dtype=np.int64,
+        count=lengths.sum(),
+    )
+    segment = np.repeat(np.arange(len(paths)), lengths)
+    starts = np.cumsum(lengths) - lengths
+    position = np.arange(len(index)) - starts[segment]
+    own_warehouse = np.array([label_index[node] for node in warehouse_nodes])
+    own_warehouse = own_warehouse[segment % nwarehouses]
+    interior = (position > 0) & (position < lengths[segment] - 1)
+
+    # Endpoints are checked before unknown labels are masked out below.
+    ends = (position == 0) | (position == lengths[segment] - 1)
+    wrong_end = np.bincount(
+        segment[ends & (index != own_warehouse)], minlength=len(paths)
+    )
+
+    # Any truck visiting an unknown node is excluded from further checks.
+    unknown = index < 0
+    broken = np.bincount(segment[unknown], minlength=len(paths)) > 0
+    known = ~broken[segment]
+    index = np.where(known, index, 0)
+
+    # Costs, from lookups of all consecutive pairs within each path.
+    is_arc = segment[:-1] == segment[1:]
+    arc_segment = segment[:-1][is_arc]
+    arc_src, arc_dst = index[:-1][is_arc], index[1:][is_arc]
+    truck_cost = np.bincount(
+        arc_segment, weights=matrix[arc_src, arc_dst], minlength=len(paths)
+    ).astype(float)
+    truck_cost[broken] = np.nan
+    truck_cost = truck_cost.reshape(nsolutions, nwarehouses)
+    repeated = np.bincount(
+        arc_segment[(arc_src == arc_dst) & known[:-1][is_arc]], minlength=len(paths)
+    )
+
+    # Docking and phases of each visit.
+    crossdock_index = label_index[instance.crossdock_node]
+    is_dock = known & (index == crossdock_index)
+    dock_count = np.bincount(segment[is_dock], minlength=len(paths))
+    docks_before = np.concatenate([[0], np.cumsum(is_dock)])
+    post = docks_before[:-1] - docks_before[starts][segment] > 0
+    visit = known & interior & ~is_dock
+    pre_visit, post_visit = visit & ~post, visit & post
+
+    is_warehouse = np.array([label in instance.warehouse_nodes for label in labels])
+    bad_warehouse = known & interior & is_warehouse[index]
+
+    def phase_repeats(mask):
+        keys, counts = np.unique(
+            segment[mask] * nlabels + index[mask], return_counts=True
+        )
+        return keys[counts > 1]
+
+    # Demand service counts for every (solution, demand), where the demands are
+    # the (warehouse, node) pairs of the instance, keyed like phase_repeats.
+    demand_key = np.array(
+        sorted(
+            {
+                w * nlabels + label_index[d]
+                for w, warehouse_node in enumerate(warehouse_nodes)
+                for d in instance.warehouse_demand[warehouse_node]
+            }
+        ),
+        dtype=np.int64,
+    )
+    demand_w, demand_i = np.divmod(demand_key, nlabels)
+    served = np.zeros((nsolutions, len(demand_key)), dtype=np.int64)
+
+    def add_service(s, key):
+        d = np.searchsorted(demand_key, key)
+        hit = d < len(demand_key)
+        hit[hit] = demand_key[d[hit]] == key[hit]
+        np.add.at(served, (s[hit], d[hit]), 1)
+
+    add_service(
+        segment[pre_visit] // nwarehouses,
+        segment[pre_visit] % nwarehouses * nlabels + index[pre_visit],
+    )
+    # A post-dock visit serves the node's demand for every warehouse that docks.
+    docked = (dock_count > 0).reshape(nsolutions, nwarehouses)
+    post_s, post_i = segment[post_visit] // nwarehouses, index[post_visit]
+    for w in range(nwarehouses):
+        mask = docked[post_s, w]
+        add_service(post_s[mask], w * nlabels + post_i[mask])
+    misserved = (served != 1) & ~broken.reshape(nsolutions, nwarehouses)[:, demand_w]
+
+    # Only the failures are walked in python, to build readable messages.
+    def report(p, message):
+        violations[p // nwarehouses].append(
+            f"Truck {warehouse_nodes[p % nwarehouses]}: {message}"
+        )
+
+    for p in np.flatnonzero(lengths == 0):
+        report(p, "no path")
+    for p in np.flatnonzero((lengths > 0) & (lengths < 3)):
+        report(p, "path must leave and return to the warehouse")
+    for p in np.flatnonzero(broken):
+        bad_nodes = sorted({node for node in paths[p] if node not in label_index})
+        report(p, f"visits nodes {bad_nodes} which are not in the instance")
+    for p in np.flatnonzero(wrong_end):
+        report(p, "path does not start and end at its warehouse")
+    for p in np.flatnonzero(repeated):
+        report(p, "path stays at the same node between consecutive stops")
+    for p in np.unique(segment[bad_warehouse]):
+        bad_nodes = sorted({labels[i] for i in index[bad_warehouse & (segment == p)]})
+        report(p, f"visits warehouse nodes {bad_nodes} mid-path")
+    for p in np.flatnonzero(dock_count > 1):
+        report(p, f"visits the crossdock {dock_count[p]} times")
+    for phase, mask in [("pre-dock", pre_visit), ("post-dock", post_visit)]:
+        for key in phase_repeats(mask):
+            report(key // nlabels, f"visits {labels[key % nlabels]} twice {phase}")
+    for s, d in zip(*np.nonzero(misserved)):
+        violations[s].append(
+            f"Demand {labels[demand_i[d]]} of warehouse {warehouse_nodes[demand_w[d]]} "
+            f"is served {served[s, d]} times"
+        )
+
+    return BatchEvaluation(
+        warehouse_nodes=warehouse_nodes,
+        total_cost=truck_cost.sum(axis=1),
+        truck_cost=truck_cost,
+        violations=violations,
+    )
+
+
+def evaluate(
+    instance: CrossDockInstance, solution: CrossDockSolution
+) -> SolutionEvaluation:
+    """ Evaluate one solution. Just a batch of one: use evaluate_batch() for
+    bulk validation. """
+    return evaluate_batch(instance, [solution])[0]
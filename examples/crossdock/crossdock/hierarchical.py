@@ -0,0 +1,193 @@
+"""
+Hierarchical solve for instances far too large for the full model. Demand nodes
+are clustered geographically, each cluster's crossdock problem is solved
+exactly (in parallel worker processes), and the cluster routes are stitched
+into one solution per truck and tidied up with local search.
+Public API:
+    solve_hierarchical(instance) -> stitched solution, its cost and a lower bound
+
+Quality is traded against time by cluster_size (bigger clusters mean fewer
+seams but harder subproblems), the time limit on each cluster solve, and
+whether local search is run on the stitched routes.
+"""
+
+import concurrent.futures
+import dataclasses
+import math
+import multiprocessing
+from typing import Dict, List
+
+import numpy as np
+from icontract import require
+
+from .algorithms import join_path, repair_solution, split_path, two_opt
+from .evaluation import evaluate
+from .instance import CrossDockInstance, CrossDockSolution, EuclideanDistances
+from .model import construct_model, solve_model
+
+
+__all__ = ["solve_hierarchical"]
+
+
+@dataclasses.dataclass
+class HierarchicalResult:
+
+    solution: CrossDockSolution
+    objective: float
+    bound: float
+    clusters: List[List[int]]
+
+
+def cluster_nodes(points, nodes, cluster_size):
+    """ Partition nodes into geographic clusters of at most cluster_size nodes
+    by recursive bisection: split at the median of whichever coordinate has the
+    wider spread until each part is small enough. Unlike k-means this bounds the
+    size (so the difficulty) of every cluster subproblem. """
+    nodes = sorted(nodes)
+    if len(nodes) <= cluster_size:
+        return [nodes] if nodes else []
+    coords = np.array([points[node] for node in nodes], dtype=float)
+    axis = np.argmax(coords.max(axis=0) - coords.min(axis=0))
+    order = np.argsort(coords[:, axis], kind="stable")
+    half = len(nodes) // 2
+    return cluster_nodes(
+        points, [nodes[i] for i in order[:half]], cluster_size
+    ) + cluster_nodes(points, [nodes[i] for i in order[half:]], cluster_size)
+
+
+def inflow_bound(instance):
+    """ Every demand node must be entered at least once, and every warehouse
+    exactly once (by its own truck returning), each by a distinct arc. So the
+    sum of the cheapest possible arcs into each of them is a lower bound. """
+    labels = sorted(instance.all_nodes)
+    matrix = np.array(instance.distances.distance_matrix(labels), dtype=float)
+    np.fill_diagonal(matrix, np.inf)
+    is_warehouse = np.array([label in instance.warehouse_nodes for label in labels])
+    demand = np.array([label in instance.all_demand_nodes for label in labels])
+    # Warehouses can't be reached from other warehouses.
+    into_warehouse = matrix[~is_warehouse][:, is_warehouse].min(axis=0)
+    return into_warehouse.sum() + matrix[:, demand].min(axis=0).sum()
+
+
+def _solve_cluster(instance, time_limit):
+    """ Runs in a worker process. Returns None if no solution is found within
+    the time limit; the cluster's demand is then left to the repair step. """
+    model = construct_model(instance)
+    model.gurobi_model.params.OutputFlag = 0
+    if time_limit is not None:
+        model.gurobi_model.params.TimeLimit = time_limit
+    try:
+        return solve_model(model, threads=1).paths
+    except AttributeError:
+        # Gurobi's way of saying there is no solution to read values from.
+        if model.gurobi_model.SolCount > 0:
+            raise
+        return None
+    finally:
+        model.gurobi_model.dispose()
+
+
+def _stitch(instance, cluster_paths: List[Dict[int, List[int]]]):
+    """ Concatenate each truck's pre- and post-dock visits from every cluster
+    (in the order given). A truck docks if it docks in any cluster. """
+    parts = {w: ([], [], False) for w in instance.warehouse_nodes}
+    for paths in cluster_paths:
+        for warehouse_node, path in paths.items():
+            pre, post, docks = split_path(path, instance.crossdock_node)
+            all_pre, all_post, all_docks = parts[warehouse_node]
+            parts[warehouse_node] = (all_pre + pre, all_post + post, all_docks or docks)
+    return {
+        warehouse_node: join_path(warehouse_node, pre, post, docks)
+        for warehouse_node, (pre, post, docks) in parts.items()
+    }
+
+
+def _improve(instance, solution):
+    """ Run 2-opt separately on each phase of each truck's path, which repairs
+    the seams between clusters without changing which visits are pre- or
+    post-dock (so feasibility is preserved). """
+    improved = {}
+    for warehouse_node, path in solution.paths.items():
+        pre, post, docks = split_path(path, instance.crossdock_node)
+        end = instance.crossdock_node if docks else warehouse_node
+        phases = [[warehouse_node] + pre + [end]]
+        if docks:
+            phases.append([instance.crossdock_node] + post + [warehouse_node])
+        phases = [
+            two_opt(phase, instance.distances.distance_matrix(phase))
+            for phase in phases
+        ]
+        pre = phases[0][1:-1]
+        post = phases[1][1:-1] if docks else []
+        improved[warehouse_node] = join_path(warehouse_node, pre, post, docks)
+    return CrossDockSolution(improved)
+
+
+@require(
+    lambda instance: isinstance(instance.distances, EuclideanDistances),
+    "Clustering needs point coordinates",
+)
+@require(lambda cluster_size: cluster_size >= 1)
+def solve_hierarchical(
+    instance,
+    *,
+    cluster_size=20,
+    time_limit=None,
+    local_search=True,
+    workers=None,
+):
+    """ Cluster the demand nodes into groups of at most cluster_size, solve each
+    cluster's sub-instance (all warehouses with demand there) with the full
+    model in parallel, stitch and repair the routes, then improve them with
+    local search. time_limit applies to each cluster solve. The bound is the
+    inflow bound of the whole instance, so it's cheap but not tight. """
+    clusters = cluster_nodes(
+        instance.distances.points, instance.all_demand_nodes, cluster_size
+    )
+    # Visit clusters in order of angle around the crossdock, so that stitched
+    # routes sweep around rather than jumping back and forth.
+    origin = np.array(instance.distances.points[instance.crossdock_node])
+
+    def angle(cluster):
+        dx, dy = (
+            np.mean([instance.distances.points[node] for node in cluster], axis=0)
+            - origin
+        )
+        return math.atan2(dy, dx)
+
+    clusters.sort(key=angle)
+
+    sub_instances = []
+    for cluster in clusters:
+        members = set(cluster)
+        warehouse_demand = {
+            warehouse_node: [node for node in demand if node in members]
+            for warehouse_node, demand in instance.warehouse_demand.items()
+        }
+        sub_instances.append(
+            CrossDockInstance(
+                warehouse_demand={w: d for w, d in warehouse_demand.items() if d},
+                distances=instance.distances,
+            )
+        )
+
+    # Spawned (not forked) workers, so each one gets a fresh Gurobi environment.
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(workers, mp_context=context) as pool:
+        cluster_paths = list(
+            pool.map(_solve_cluster, sub_instances, [time_limit] * len(sub_instances))
+        )
+
+    solution = repair_solution(
+        instance, _stitch(instance, [paths for paths in cluster_paths if paths])
+    )
+    if local_search:
+        solution = _improve(instance, solution)
+    result = evaluate(instance, solution)
+    assert result.feasible, result.violations
+    return HierarchicalResult(
+        solution=solution,
+        objective=result.total_cost,
+        bound=inflow_bound(instance),
+        clusters=clusters,
+    )
@@ -1,14 +1,18 @@
 """ Problem instance and solution classes, random problem generator. """
 
 import json
+import os
+import pathlib
 from dataclasses import dataclass, field
 from functools import cached_property
 from itertools import chain
 from math import sqrt
 from random import Random
-from typing import Dict, FrozenSet, List, Tuple
+from typing import Dict, FrozenSet, List, Sequence, Tuple
 
-__all__ = ["read_json", "generate_random_instance"]
+import numpy as np
+
+__all__ = ["read_json", "from_json_obj", "generate_random_instance"]
 
 
 @dataclass
@@ -50,11 +54,20 @@ class CrossDockInstance:
     def distance(self, i: int, j: int) -> float:
         return self.distances.distance(i, j)
 
-    def to_json(self, file_path, pretty=False):
-        obj = {
+    def to_json_obj(self):
+        return {
             "warehouse_demand": self.warehouse_demand,
-            "points": self.distances.points,
+            **self.distances.to_json_obj(),
         }
+
+    def to_json(self, file_path, pretty=False):
+        """ A matrix file path is written relative to the json file, which is
+        how read_json resolves it. """
+        obj = self.to_json_obj()
+        if "distance_matrix" in obj:
+            obj["distance_matrix"]["file_path"] = os.path.relpath(
+                obj["distance_matrix"]["file_path"], pathlib.Path(file_path).parent
+            )
         kwargs = {"indent": 4} if pretty else {}
         with open(file_path, "w") as outfile:
             json.dump(obj, outfile, **kwargs)
@@ -72,6 +85,70 @@ class EuclideanDistances:
         dy = self.points[i][1] - self.points[j][1]
         return sqrt(dx * dx + dy * dy)
 
+    def distance_matrix(self, labels: Sequence[int]) -> np.ndarray:
+        """ Return the dense matrix of distances between the given labels, in
+        the order given. Computed in one pass rather than by pairwise calls. """
+        coords = np.array([self.points[label] for label in labels], dtype=float)
+        delta = coords[:, np.newaxis, :] - coords[np.newaxis, :, :]
+        return np.sqrt((delta * delta).sum(axis=2))
+
+    def to_json_obj(self):
+        return {"points": self.points}
+
+
+@dataclass
+class MatrixDistances:
+    """ Precomputed distances (e.g. road network travel times) stored as a float32
+    or float64 matrix in a .npy file, where row/column i belongs to labels[i].
+    The file is memory-mapped read-only, so all processes reading the same file
+    share a single copy through the page cache. Pickling sends only the path and
+    labels, and the receiving process maps the file again, so passing an instance
+    to worker processes does not copy the matrix. The path is made absolute, so it
+    means the same thing whatever the working directory. """
+
+    file_path: str
+    labels: List[int]
+    matrix: np.ndarray = field(init=False, repr=False, compare=False)
+    index: Dict[int, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.file_path = str(pathlib.Path(self.file_path).resolve())
+        self.matrix = np.load(self.file_path, mmap_mode="r")
+        assert self.matrix.dtype in (np.float32, np.float64)
+        assert self.matrix.shape == (len(self.labels), len(self.labels))
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        assert len(self.index) == len(self.labels)
+
+    def __getstate__(self):
+        return {"file_path": self.file_path, "labels": self.labels}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__post_init__()
+
+    @classmethod
+    def save(cls, file_path, labels, matrix, dtype=np.float64):
+        """ Write a matrix to file_path and return a provider which maps it. """
+        with open(file_path, "wb") as outfile:
+            np.save(outfile, np.asarray(matrix, dtype=dtype))
+        return cls(str(file_path), list(labels))
+
+    def distance(self, i: int, j: int) -> float:
+        """ Return the matrix entry for travel from i to j. """
+        assert i != j and i in self.index and j in self.index
+        return float(self.matrix[self.index[i], self.index[j]])
+
+    def distance_matrix(self, labels: Sequence[int]) -> np.ndarray:
+        """ Return the matrix restricted to the given labels, in the order given.
+        If that's the full matrix in file order, no copy is made. """
+        indices = [self.index[label] for label in labels]
+        if indices == list(range(len(self.labels))):
+            return self.matrix
+        return self.matrix[np.ix_(indices, indices)]
+
+    def to_json_obj(self):
+        return {"distance_matrix": {"file_path": self.file_path, "labels": self.labels}}
+
 
 @dataclass
 class CrossDockSolution:
@@ -95,20 +172,35 @@ class CrossDockSolution:
         )
 
 
-def read_json(file_path):
-    with open(file_path) as infile:
-        obj = json.load(infile)
+def from_json_obj(obj, base_path="."):
+    """ Build an instance from parsed json with either euclidean points or a
+    matrix file. A relative matrix file path is relative to base_path. """
+    if "distance_matrix" in obj:
+        matrix_path = pathlib.Path(base_path).joinpath(
+            obj["distance_matrix"]["file_path"]
+        )
+        distances = MatrixDistances(
+            str(matrix_path), [int(label) for label in obj["distance_matrix"]["labels"]]
+        )
+    else:
+        distances = EuclideanDistances(
+            {int(label): tuple(point) for label, point in obj["points"].items()}
+        )
     return CrossDockInstance(
         warehouse_demand={
             int(warehouse): demand
             for warehouse, demand in obj["warehouse_demand"].items()
         },
-        distances=EuclideanDistances(
-            {int(label): tuple(point) for label, point in obj["points"].items()}
-        ),
+        distances=distances,
     )
 
 
+def read_json(file_path):
+    with open(file_path) as infile:
+        obj = json.load(infile)
+    return from_json_obj(obj, base_path=pathlib.Path(file_path).parent)
+
+
 def generate_random_instance(seed: int, npoints: int, nwarehouses: int):
     rstate = Random(seed)
     points = {i: (rstate.uniform(0, 1), rstate.uniform(0, 1)) for i in range(npoints)}
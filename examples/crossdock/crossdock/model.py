@@ -3,6 +3,7 @@ Contains the Gurobi modelling components for solving a crossdock instance.
 Public API:
     construct_model(instance) -> formulated model (gurobi model + variables)
     solve_model(model) -> solution components (arcs used + dock variables)
+    solve_model_iter(model) -> generator of improving solutions during the solve
 """
 
 import contextlib
@@ -10,27 +11,29 @@ import dataclasses
 import functools
 import itertools
 import logging
+import queue
 import sys
+import threading
 
 import gurobipy
 
 from .algorithms import get_subtours, path_from_edges
 from .instance import CrossDockSolution
-from .utils import solve_wrapper
+from .utils import load_profile, solve_wrapper
 
+__all__ = ["construct_model", "solve_model", "solve_model_iter"]
 
-__all__ = ["construct_model", "solve_model"]
 
-
-def _initialise_variables(instance):
+def _initialise_variables(instance, env=None):
     """
     Construct a model with binary variables for pre- and post-dock arc variables
     for all trucks, and intermediary variables which specify whether each truck
     visits the crossdock.
     This process enumerates all possible arcs, even though there are a lot which
     will later be disallowed due to absence of demand.
+    The model is created in env if given, otherwise in the default environment.
     """
-    model = gurobipy.Model()
+    model = gurobipy.Model(env=env)
     arc_variables = {
         phase: {
             k: {
@@ -156,7 +159,13 @@ def _add_demand_constraints(instance, model, arc_variables, dock_variables):
                 )
             )
             model.addConstr(incoming == 1)
-    # Disallowed arcs. Using sets properly would mean these variables can be removed.
+    model.update()
+
+
+def _add_disallowed_arc_constraints(instance, model, arc_variables):
+    """ Fix to zero the arcs which no truck may use: visits to other trucks'
+    warehouses, post-dock arcs into the dock and pre-dock arcs out of it. """
+    # Using sets properly would mean these variables can be removed.
     for warehouse_node in instance.warehouse_nodes:
         pre_arc_w = arc_variables["pre"][warehouse_node]
         post_arc_w = arc_variables["post"][warehouse_node]
@@ -192,15 +201,18 @@ class FullModel:
     dock_variables: None
 
 
-def construct_model(instance, *, hotstart_single_tour_order=None, fix_dock_vars=None):
+def construct_model(
+    instance, *, env=None, hotstart_single_tour_order=None, fix_dock_vars=None
+):
     """ Build Gurobi model and capture key variables to return as a structure.
     NOTE These functions do leave things in a partially built state, but I think it's
     worth splitting them out anyway so that the steps in model construction are
     clear and the code is signposted.
     """
-    model, arc_variables, dock_variables = _initialise_variables(instance)
+    model, arc_variables, dock_variables = _initialise_variables(instance, env=env)
     _add_flow_constraints(instance, model, arc_variables, dock_variables)
     _add_demand_constraints(instance, model, arc_variables, dock_variables)
+    _add_disallowed_arc_constraints(instance, model, arc_variables)
     # Once the full model is returned from this function, everything is consistent.
     return FullModel(
         instance=instance,
@@ -210,15 +222,15 @@ def construct_model(instance, *, hotstart_single_tour_order=None, fix_dock_vars=
     )
 
 
-def extract_solution(arc_variables):
-    """ Process binary variables to return a list of arcs traversed in the
-    solution by each warehouse/truck. """
+def _solution_from_values(arc_values):
+    """ Process binary variable values (with the same nesting as the arc
+    variables) to return the path taken by each warehouse/truck. """
     arcs = {
         phase: {
-            k: [tuple(arc) for arc, var in w_phase_arc_variables.items() if var.X > 0.5]
-            for k, w_phase_arc_variables in phase_arc_variables.items()
+            k: [tuple(arc) for arc, value in w_phase_arc_values.items() if value > 0.5]
+            for k, w_phase_arc_values in phase_arc_values.items()
         }
-        for phase, phase_arc_variables in arc_variables.items()
+        for phase, phase_arc_values in arc_values.items()
     }
     arcs = {k: (arcs["pre"][k], arcs["post"][k]) for k in arcs["pre"].keys()}
     return CrossDockSolution(
@@ -230,6 +242,34 @@ def extract_solution(arc_variables):
     )
 
 
+def extract_solution(arc_variables):
+    """ Process binary variables to return a list of arcs traversed in the
+    solution by each warehouse/truck. """
+    return _solution_from_values(
+        {
+            phase: {
+                k: {arc: var.X for arc, var in w_phase_arc_variables.items()}
+                for k, w_phase_arc_variables in phase_arc_variables.items()
+            }
+            for phase, phase_arc_variables in arc_variables.items()
+        }
+    )
+
+
+def _extract_callback_solution(model, arc_variables):
+    """ As for extract_solution, but reads the candidate solution in a MIPSOL
+    callback. Only valid once the candidate is known to have no subtours. """
+    return _solution_from_values(
+        {
+            phase: {
+                k: model.cbGetSolution(w_phase_arc_variables)
+                for k, w_phase_arc_variables in phase_arc_variables.items()
+            }
+            for phase, phase_arc_variables in arc_variables.items()
+        }
+    )
+
+
 def subtour_elimination_callback(model, arc_variables):
     """ Look for subtours and generate constraints which rule out the shortest.
     NOTE that this callback does not use anything other than its arguments,
@@ -237,7 +277,9 @@ def subtour_elimination_callback(model, arc_variables):
     This means it would be testable in isolation with a good mocking object for the
     gurobi model (feed values in via cbGetSolution, check the produced constraint
     by capturing cbLazy). Something worth developing?
+    Returns True if the candidate solution was accepted (no subtours found).
     """
+    accepted = True
     for phase, phase_arc_var in arc_variables.items():
         for k, w_phase_arc_var in phase_arc_var.items():
             edges = [
@@ -263,11 +305,20 @@ def subtour_elimination_callback(model, arc_variables):
                         for arc in zip(shortest, shortest[1:] + shortest[:1])
                     )
                     model.cbLazy(arcs <= (len(shortest) - 1))
+                    accepted = False
+    return accepted
 
 
-def solve_model(model, threads=None):
+def solve_model(model, threads=None, profile=None, **params):
     """ Given a formulated model, solve with a subtour elimination callback. Return
-    the travel arcs used in the solution and values of the dock variables. """
+    the travel arcs used in the solution and values of the dock variables.
+    Gurobi parameters come from the named profile (see utils.load_profile), then
+    any given params, then threads, with later ones taking precedence. """
+    if profile is not None:
+        params = {**load_profile(profile)["params"], **params}
+    params["LazyConstraints"] = 1
+    if threads is not None:
+        params["Threads"] = threads
     solve_wrapper(
         model.gurobi_model,
         callbacks={
@@ -275,7 +326,67 @@ def solve_model(model, threads=None):
                 subtour_elimination_callback, arc_variables=model.arc_variables
             )
         },
-        LazyConstraints=1,
-        Threads=threads,
+        **params,
     )
     return extract_solution(model.arc_variables)
+
+
+def solve_model_iter(model, *, threads=None, time_limit=None, mip_gap=None):
+    """ Anytime version of solve_model. Runs the solve in a background thread and
+    yields (solution, objective, bound, elapsed) each time an improving incumbent
+    is accepted, plus once more at the end if the final bound is tighter than the
+    last one reported. Breaking out of the loop terminates the solve. """
+    updates = queue.Queue()
+    best = {"objective": gurobipy.GRB.INFINITY, "bound": -gurobipy.GRB.INFINITY}
+
+    def on_solution(cb_model):
+        if not subtour_elimination_callback(cb_model, model.arc_variables):
+            return
+        objective = cb_model.cbGet(gurobipy.GRB.callback.MIPSOL_OBJ)
+        if objective >= best["objective"]:
+            return
+        best["objective"] = objective
+        best["bound"] = cb_model.cbGet(gurobipy.GRB.callback.MIPSOL_OBJBND)
+        solution = _extract_callback_solution(cb_model, model.arc_variables)
+        elapsed = cb_model.cbGet(gurobipy.GRB.callback.RUNTIME)
+        updates.put(("incumbent", (solution, objective, best["bound"], elapsed)))
+
+    def solve():
+        try:
+            solve_wrapper(
+                model.gurobi_model,
+                callbacks={gurobipy.GRB.callback.MIPSOL: on_solution},
+                LazyConstraints=1,
+                Threads=threads,
+                TimeLimit=time_limit,
+                MIPGap=mip_gap,
+            )
+            gurobi_model = model.gurobi_model
+            if gurobi_model.SolCount > 0 and gurobi_model.ObjBound > best["bound"]:
+                final = (
+                    extract_solution(model.arc_variables),
+                    gurobi_model.ObjVal,
+                    gurobi_model.ObjBound,
+                    gurobi_model.Runtime,
+                )
+                updates.put(("incumbent", final))
+            updates.put(("done", None))
+        except Exception as e:
+            updates.put(("error", e))
+
+    thread = threading.Thread(target=solve, name="solve_model_iter", daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, item = updates.get()
+            if kind == "error":
+                raise item
+            if kind == "done":
+                return
+            yield item
+    finally:
+        # Safe to call from another thread, and takes effect at once rather than
+        # waiting for the next callback (which may be a long way off in presolve
+        # or the root relaxation).
+        model.gurobi_model.terminate()
+        thread.join()
@@ -0,0 +1,191 @@
+"""
+Tuning harness for solver parameters and model options, run over a sample of
+instances with trials in parallel worker processes.
+Public API:
+    grid_configurations(space) -> every combination of the values in space
+    random_configurations(space, count, seed) -> random sample of combinations
+    tune(instances, configurations) -> trial records and the best configuration
+
+A search space maps "params" (gurobi parameters passed to solve_model) and
+"model" (options passed to construct_model) to lists of candidate values:
+    {"params": {"MIPFocus": [0, 1, 2], "Cuts": [-1, 0, 2]}, "model": {}}
+A configuration picks one value for each, and has the same layout as a profile
+written by utils.save_profile, so the winner can be saved and loaded by name.
+
+Configurations are raced: all surviving configurations are run on one instance
+at a time, and after min_rounds instances any configuration scoring worse than
+race_factor times the best score (plus race_slack seconds, so that timing noise
+on quick solves doesn't decide anything) is dropped. A configuration's score is
+its mean runtime, where an instance not solved to optimality within the time
+limit counts as penalty times the time limit.
+"""
+
+import concurrent.futures
+import dataclasses
+import itertools
+import logging
+import multiprocessing
+import random
+from typing import Dict, List
+
+import gurobipy
+
+from .model import construct_model, solve_model
+
+
+__all__ = ["grid_configurations", "random_configurations", "tune"]
+
+
+# A reasonable starting point for a MIP with lazy constraints.
+DEFAULT_SPACE = {
+    "params": {
+        "MIPFocus": [0, 1, 2],
+        "Cuts": [-1, 0, 2],
+        "Heuristics": [0.05, 0.2],
+        "Presolve": [-1, 2],
+    },
+    "model": {},
+}
+
+
+@dataclasses.dataclass
+class Trial:
+    """ One configuration on one instance. runtime is the time to optimality
+    if optimal, otherwise the time limit; gap is the gap when the solve stopped
+    (inf if no solution was found). """
+
+    configuration: int
+    instance: int
+    runtime: float
+    gap: float
+    optimal: bool
+
+
+@dataclasses.dataclass
+class TuningResult:
+
+    configurations: List[Dict]
+    trials: List[Trial]
+    scores: Dict[int, float]
+    survivors: List[int]
+
+    @property
+    def best(self) -> Dict:
+        """ Best configuration which survived racing, as a profile. """
+        index = min(self.survivors, key=self.scores.__getitem__)
+        return {
+            **self.configurations[index],
+            "tuning": {
+                "score": self.scores[index],
+                "instances": sum(t.configuration == index for t in self.trials),
+            },
+        }
+
+
+def _space_items(space):
+    return [
+        (section, name, values)
+        for section in ("params", "model")
+        for name, values in space.get(section, {}).items()
+    ]
+
+
+def _configuration(items, choice):
+    configuration = {"params": {}, "model": {}}
+    for (section, name, _), value in zip(items, choice):
+        configuration[section][name] = value
+    return configuration
+
+
+def grid_configurations(space):
+    items = _space_items(space)
+    return [
+        _configuration(items, choice)
+        for choice in itertools.product(*(values for _, _, values in items))
+    ]
+
+
+def random_configurations(space, count, seed=0):
+    """ Sample distinct configurations (all of them, if count exceeds the size
+    of the grid). """
+    grid = grid_configurations(space)
+    return random.Random(seed).sample(grid, min(count, len(grid)))
+
+
+def _run_trial(instance, configuration, time_limit):
+    """ Runs in a worker process, single threaded so that trials running side
+    by side don't compete for cores. """
+    model = construct_model(instance, **configuration["model"])
+    gurobi_model = model.gurobi_model
+    try:
+        solve_model(
+            model,
+            threads=1,
+            OutputFlag=0,
+            TimeLimit=time_limit,
+            **configuration["params"],
+        )
+    except AttributeError:
+        # Gurobi's way of saying there is no solution to read values from.
+        if gurobi_model.SolCount > 0:
+            raise
+    try:
+        optimal = gurobi_model.Status == gurobipy.GRB.OPTIMAL
+        gap = gurobi_model.MIPGap if gurobi_model.SolCount > 0 else float("inf")
+        runtime = gurobi_model.Runtime if optimal else time_limit
+        return runtime, gap, optimal
+    finally:
+        gurobi_model.dispose()
+
+
+def tune(
+    instances,
+    configurations,
+    *,
+    time_limit=10.0,
+    workers=None,
+    min_rounds=2,
+    race_factor=1.5,
+    race_slack=0.1,
+    penalty=10.0,
+):
+    """ Race configurations over instances (see module docstring). Returns all
+    trial records, the scores of every configuration over the instances it
+    was run on, and the configurations which survived to the end. """
+    trials = []
+    survivors = list(range(len(configurations)))
+    scores = {}
+
+    def score(index):
+        runs = [t for t in trials if t.configuration == index]
+        return sum(
+            t.runtime if t.optimal else penalty * time_limit for t in runs
+        ) / len(runs)
+
+    # Spawned (not forked) workers, so each one gets a fresh Gurobi environment.
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(workers, mp_context=context) as pool:
+        for round_number, instance in enumerate(instances):
+            futures = {
+                index: pool.submit(
+                    _run_trial, instance, configurations[index], time_limit
+                )
+                for index in survivors
+            }
+            for index, future in futures.items():
+                trials.append(Trial(index, round_number, *future.result()))
+            scores.update({index: score(index) for index in survivors})
+            if round_number + 1 >= min_rounds:
+                best = min(scores[index] for index in survivors)
+                cutoff = race_factor * best + race_slack
+                dropped = [index for index in survivors if scores[index] > cutoff]
+                survivors = [index for index in survivors if scores[index] <= cutoff]
+                if dropped:
+                    logging.info(f"Round {round_number}: dropped {dropped}")
+
+    return TuningResult(
+        configurations=list(configurations),
+        trials=trials,
+        scores=scores,
+        survivors=survivors,
+    )
@@ -7,7 +7,12 @@ TODO a require() decorator that transparently handles generators
      without consuming their contents
 """
 
+import json
 import logging
+import pathlib
+
+# Named parameter profiles (e.g. written by the tuning harness) live here.
+PROFILE_DIR = pathlib.Path(__file__).parent.joinpath("profiles")
 
 
 def solve_wrapper(gurobi_model, *, callbacks, **params):
@@ -36,3 +41,27 @@ def solve_wrapper(gurobi_model, *, callbacks, **params):
     if callback_exception is not None:
         logging.error("Solve was interrupted by a callback failure.")
         raise callback_exception
+
+
+def _profile_path(name, profile_dir):
+    assert name and "/" not in name and "\\" not in name, "Profiles are given by name"
+    return pathlib.Path(profile_dir or PROFILE_DIR).joinpath(f"{name}.json")
+
+
+def load_profile(name, profile_dir=None):
+    """ Read a named profile: a dict with gurobi "params" to pass to the solver
+    and "model" options to pass to construct_model (either may be empty). """
+    with open(_profile_path(name, profile_dir)) as infile:
+        profile = json.load(infile)
+    profile.setdefault("params", {})
+    profile.setdefault("model", {})
+    return profile
+
+
+def save_profile(name, profile, profile_dir=None):
+    """ Write a profile so that it can be loaded by name. Returns its path. """
+    file_path = _profile_path(name, profile_dir)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(file_path, "w") as outfile:
+        json.dump(profile, outfile, indent=4)
+    return file_path
@@ -0,0 +1,130 @@
+"""
+Long-running solver worker. Imports and a started Gurobi environment are kept
+warm between solves, so that lots of small instances can be dispatched without
+paying interpreter start-up and license acquisition for each one.
+Public API:
+    start_env() -> a started, quiet gurobi environment to share between solves
+    handle_request(line, env) -> json reply line for one json request line
+    serve_stream(instream, outstream, env) -> handle requests until end of input
+    socket_server(socket_path, env) -> a unix socket server, for running in a thread
+    serve_socket(socket_path, env) -> handle requests on a unix socket forever
+
+Requests are json objects, one per line, giving either the path of an instance
+file or the instance itself (same layout as the instance json files), plus
+optional id (echoed back), threads and the name of a parameter profile:
+    {"id": 1, "path": "test_cases/instance-2-30.json", "profile": "tuned"}
+    {"id": 2, "instance": {"warehouse_demand": ..., "points": ...}, "threads": 1}
+Replies are json objects, one per line, in request order:
+    {"id": 1, "paths": {"1": [1, ...], ...}, "objective": 3.2, "elapsed": 0.05}
+    {"id": 2, "error": "..."}
+"""
+
+import json
+import logging
+import os
+import socketserver
+import time
+
+import gurobipy
+
+from .instance import from_json_obj, read_json
+from .model import construct_model, solve_model
+from .utils import load_profile
+
+__all__ = [
+    "start_env",
+    "handle_request",
+    "serve_stream",
+    "socket_server",
+    "serve_socket",
+]
+
+
+def start_env():
+    """ Start the shared environment with logging off, since the solver log
+    would otherwise be mixed into replies written to stdout. """
+    env = gurobipy.Env(empty=True)
+    env.setParam("OutputFlag", 0)
+    env.start()
+    return env
+
+
+def _solve_request(request, env, threads):
+    if "path" in request:
+        instance = read_json(request["path"])
+    else:
+        instance = from_json_obj(request["instance"])
+    profile = request.get("profile")
+    options = load_profile(profile)["model"] if profile else {}
+    model = construct_model(instance, env=env, **options)
+    try:
+        solution = solve_model(
+            model, threads=request.get("threads", threads), profile=profile
+        )
+        objective = model.gurobi_model.ObjVal
+    finally:
+        # Free the model now, rather than letting a long-lived process hang
+        # on to it until garbage collection gets around to it.
+        model.gurobi_model.dispose()
+    return {"paths": solution.paths, "objective": objective}
+
+
+def handle_request(line, env, threads=None):
+    """ Solve the instance given by one request line and return the reply line.
+    Any failure is reported in the reply, so one bad request doesn't bring down
+    the worker. threads is the default for requests which don't specify it. """
+    start = time.perf_counter()
+    request = {}
+    try:
+        request = json.loads(line)
+        reply = _solve_request(request, env, threads)
+    except Exception as e:
+        logging.exception("Failed to handle request.")
+        reply = {"error": f"{type(e).__name__}: {e}"}
+    if isinstance(request, dict) and "id" in request:
+        reply["id"] = request["id"]
+    reply["elapsed"] = time.perf_counter() - start
+    return json.dumps(reply)
+
+
+def serve_stream(instream, outstream, env, threads=None):
+    """ Handle json line requests from instream (e.g. stdin) until it closes,
+    writing each reply to outstream as soon as it is ready. Blank lines are
+    ignored. """
+    for line in instream:
+        if line.strip():
+            outstream.write(handle_request(line, env, threads) + "\n")
+            outstream.flush()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if line.strip():
+                reply = handle_request(line, self.server.env, self.server.threads)
+                self.wfile.write(reply.encode() + b"\n")
+                self.wfile.flush()
+
+
+class _WorkerServer(socketserver.UnixStreamServer):
+    def server_close(self):
+        super().server_close()
+        os.unlink(self.server_address)
+
+
+def socket_server(socket_path, env, threads=None):
+    """ Bind a unix socket server which handles one connection at a time, so that
+    solves never compete for the shared environment. Each connection can send
+    any number of requests. Run it with serve_forever() and stop it from another
+    thread with shutdown(); closing the server removes the socket. """
+    server = _WorkerServer(socket_path, _RequestHandler)
+    server.env = env
+    server.threads = threads
+    return server
+
+
+def serve_socket(socket_path, env, threads=None):
+    """ Handle requests on a unix socket until interrupted, then remove the
+    socket. """
+    with socket_server(socket_path, env, threads) as server:
+        server.serve_forever()
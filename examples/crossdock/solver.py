@@ -1,25 +1,94 @@
 import logging
+import sys
 
 import click
 
+import crossdock.decomposition
+import crossdock.hierarchical
 import crossdock.instance
 import crossdock.model
+import crossdock.utils
+import crossdock.worker
 
 logging.basicConfig(level=logging.WARNING)
 
 
 @click.command()
-@click.argument("file-path", type=click.Path(exists=True, dir_okay=False))
+@click.argument(
+    "file-path", type=click.Path(exists=True, dir_okay=False), required=False
+)
 @click.option("--threads", type=int, default=None)
-def run(file_path, threads):
+@click.option(
+    "--profile",
+    default=None,
+    help="Named parameter profile (e.g. written by tune.py) for the full model.",
+)
+@click.option(
+    "--serve",
+    is_flag=True,
+    help="Run as a warm worker, solving json line requests from stdin.",
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Run as a warm worker, solving json line requests on this unix socket.",
+)
+@click.option(
+    "--decompose",
+    is_flag=True,
+    help="Solve by Lagrangian decomposition into parallel per-truck subproblems.",
+)
+@click.option(
+    "--cluster-size",
+    type=int,
+    default=None,
+    help="Solve hierarchically, in geographic clusters of at most this many nodes.",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Processes for --decompose or --cluster-size.",
+)
+def run(
+    file_path, threads, profile, serve, socket_path, decompose, cluster_size, workers
+):
+    if socket_path is not None:
+        crossdock.worker.serve_socket(
+            socket_path, crossdock.worker.start_env(), threads=threads
+        )
+        return
+    if serve:
+        crossdock.worker.serve_stream(
+            sys.stdin, sys.stdout, crossdock.worker.start_env(), threads=threads
+        )
+        return
+    if file_path is None:
+        raise click.UsageError("Give an instance file, or --serve or --socket.")
     instance = crossdock.instance.read_json(file_path)
-    model = crossdock.model.construct_model(instance)
-    solution = crossdock.model.solve_model(model, threads=threads)
+    if decompose or cluster_size is not None:
+        if decompose:
+            result = crossdock.decomposition.solve_decomposed(instance, workers=workers)
+        else:
+            result = crossdock.hierarchical.solve_hierarchical(
+                instance, cluster_size=cluster_size, workers=workers
+            )
+        click.echo(instance)
+        click.echo(result.solution)
+        click.echo(f"Objective {result.objective:.4f} bound {result.bound:.4f}")
+        return
+    options = crossdock.utils.load_profile(profile)["model"] if profile else {}
+    model = crossdock.model.construct_model(instance, **options)
+    solution = crossdock.model.solve_model(model, threads=threads, profile=profile)
     click.echo(instance)
     click.echo(solution)
 
 
-run()
+# Guarded, since worker processes started by --decompose (etc) import this module.
+if __name__ == "__main__":
+    run()
 
 
 # instance = generate_random_instance(19675, 25, 3)
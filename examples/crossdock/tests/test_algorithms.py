@@ -8,9 +8,26 @@ able to handle, and let the functions internal asserts do the testing.
 from itertools import chain
 
 from hypothesis import assume, given, settings
-from hypothesis.strategies import lists, integers, tuples, just
+from hypothesis.strategies import (
+    fixed_dictionaries,
+    floats,
+    lists,
+    integers,
+    tuples,
+    just,
+    sampled_from,
+)
+import numpy as np
 
-from crossdock.algorithms import get_subtours, path_from_edges, single_tour_heuristic
+from crossdock.algorithms import (
+    get_subtours,
+    path_from_edges,
+    repair_solution,
+    single_tour_heuristic,
+    two_opt,
+)
+from crossdock.evaluation import evaluate
+from crossdock.instance import CrossDockSolution, generate_random_instance
 from .test_instance import st_instance_euclidean
 
 
@@ -61,3 +78,57 @@ def test_single_tour_heuristic(instance):
     """ Just throw test cases at the algorithm and rely on its internal assertions
     to check that it works as planned. """
     single_tour_heuristic(instance)
+
+
+@given(
+    st_instance_euclidean.flatmap(
+        lambda instance: tuples(
+            just(instance),
+            fixed_dictionaries(
+                {
+                    warehouse_node: lists(
+                        sampled_from(sorted(instance.all_nodes)), max_size=10
+                    )
+                    for warehouse_node in instance.warehouse_nodes
+                }
+            ),
+        )
+    )
+)
+def test_repair_solution(arg):
+    """ Whatever junk goes in (repeated nodes, other warehouses, several dock
+    visits) the repaired solution should be feasible. """
+    instance, middles = arg
+    paths = {w: [w] + middle + [w] for w, middle in middles.items()}
+    result = evaluate(instance, repair_solution(instance, paths))
+    assert result.feasible, result.violations
+
+
+def test_repair_solution_keeps_feasible():
+    """ A solution which is already feasible shouldn't be changed. """
+    instance = generate_random_instance(0, 12, 2)
+    order = single_tour_heuristic(instance)
+    paths = {1: [1] + order[:-1] + [1], 2: [2, 0, 2]}
+    assert evaluate(instance, CrossDockSolution(paths)).feasible
+    assert repair_solution(instance, paths).paths == paths
+
+
+@given(
+    lists(
+        tuples(floats(min_value=0, max_value=1), floats(min_value=0, max_value=1)),
+        min_size=2,
+        max_size=20,
+    )
+)
+def test_two_opt(points):
+    """ Endpoints stay put, and the path never gets longer. Position is used as
+    the label, so the contracts on two_opt check it's a reordering. """
+    coords = np.array(points)
+    delta = coords[:, np.newaxis, :] - coords[np.newaxis, :, :]
+    matrix = np.sqrt((delta * delta).sum(axis=2))
+    path = list(range(len(points)))
+
+    def length(path):
+        return sum(matrix[i, j] for i, j in zip(path, path[1:]))
+
+    assert length(two_opt(path, matrix)) <= length(path) + 1e-9
@@ -0,0 +1,37 @@
+import pytest
+
+from crossdock.decomposition import _construct_subproblem, solve_decomposed
+from crossdock.evaluation import evaluate
+from crossdock.instance import generate_random_instance
+from crossdock.model import construct_model, solve_model
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_solve_decomposed(seed):
+    """ The incumbent must be feasible and the bound must not cut off the
+    optimal solution of the full model. Small instances so the full model
+    solves quickly. """
+    instance = generate_random_instance(seed, 8, 2)
+    result = solve_decomposed(instance, workers=2, max_iterations=20)
+    evaluation = evaluate(instance, result.solution)
+    assert evaluation.feasible, evaluation.violations
+    assert evaluation.total_cost == pytest.approx(result.objective)
+    optimal = evaluate(instance, solve_model(construct_model(instance))).total_cost
+    assert result.bound <= optimal + 1e-6
+    assert optimal <= result.objective + 1e-6
+    assert 1 <= result.iterations <= 20
+
+
+def test_construct_subproblem():
+    """ With no prizes, the cheapest thing a truck can do is a round trip to a
+    single node (possibly the crossdock). """
+    instance = generate_random_instance(4, 8, 2)
+    model = _construct_subproblem(instance, 1, {}, {}, 0.0)
+    solution = solve_model(model)
+    assert len(solution.paths[1]) == 3
+    nearest = min(
+        instance.distance(1, node) + instance.distance(node, 1)
+        for node in instance.all_nodes
+        if node not in instance.warehouse_nodes
+    )
+    assert model.gurobi_model.ObjVal == pytest.approx(nearest)
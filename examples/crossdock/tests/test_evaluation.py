@@ -0,0 +1,126 @@
+from hypothesis import given
+import pytest
+
+from crossdock.algorithms import single_tour_heuristic
+from crossdock.evaluation import evaluate, evaluate_batch
+from crossdock.instance import CrossDockInstance, CrossDockSolution, EuclideanDistances
+from .test_instance import st_instance_euclidean
+
+
+def single_tour_solution(instance):
+    """ Feasible by construction: the first truck docks and then serves all
+    demand, every other truck just drops its load at the dock. """
+    order = single_tour_heuristic(instance)
+    first, *others = instance.warehouse_nodes
+    paths = {first: [first] + order}
+    paths.update(
+        {
+            warehouse_node: [warehouse_node, 0, warehouse_node]
+            for warehouse_node in others
+        }
+    )
+    return CrossDockSolution(paths)
+
+
+def path_cost(instance, path):
+    return sum(instance.distance(i, j) for i, j in zip(path, path[1:]))
+
+
+@given(st_instance_euclidean)
+def test_evaluate_single_tour(instance):
+    """ Costs should match a plain python sum along each path. """
+    solution = single_tour_solution(instance)
+    result = evaluate(instance, solution)
+    assert result.feasible, result.violations
+    for warehouse_node, path in solution.paths.items():
+        assert result.truck_costs[warehouse_node] == pytest.approx(
+            path_cost(instance, path)
+        )
+    assert result.total_cost == pytest.approx(sum(result.truck_costs.values()))
+
+
+@given(st_instance_euclidean)
+def test_evaluate_batch(instance):
+    """ A batch gives the same answers as evaluating one at a time. """
+    good = single_tour_solution(instance)
+    bad = CrossDockSolution({})
+    batch = evaluate_batch(instance, [good, bad, good])
+    assert len(batch) == 3
+    assert list(batch.feasible) == [True, False, True]
+    assert batch[0] == evaluate(instance, good)
+    assert batch[1].violations == evaluate(instance, bad).violations
+
+
+instance = CrossDockInstance(
+    warehouse_demand={1: [3, 4], 2: [4, 5]},
+    distances=EuclideanDistances(
+        {0: (0, 0), 1: (1, 0), 2: (-1, 0), 3: (1, 1), 4: (0, 1), 5: (-1, 1)}
+    ),
+)
+
+
+@pytest.mark.parametrize(
+    "paths, expected",
+    [
+        # Each truck serves its own demand pre-dock.
+        ({1: [1, 3, 4, 1], 2: [2, 4, 5, 2]}, []),
+        # Truck 1 serves everything post-dock.
+        ({1: [1, 0, 3, 4, 5, 1], 2: [2, 0, 2]}, []),
+        # Demand 4 is served post-dock to both warehouses.
+        ({1: [1, 3, 0, 4, 1], 2: [2, 5, 0, 2]}, []),
+        (
+            {1: [1, 3, 4, 1]},
+            ["Truck 2: no path"]
+            + [f"Demand {d} of warehouse 2 is served 0 times" for d in (4, 5)],
+        ),
+        (
+            {1: [1, 3, 4, 1], 2: [2, 4, 5, 2], 7: [7, 7]},
+            ["Path given for 7, which is not a warehouse"],
+        ),
+        (
+            {1: [1, 3, 4, 9, 1], 2: [2, 4, 5, 2]},
+            ["Truck 1: visits nodes [9] which are not in the instance"],
+        ),
+        (
+            {1: [1, 3, 4, 0], 2: [2, 4, 5, 2]},
+            ["Truck 1: path does not start and end at its warehouse"],
+        ),
+        (
+            {1: [1, 3, 2, 4, 1], 2: [2, 4, 5, 2]},
+            ["Truck 1: visits warehouse nodes [2] mid-path"],
+        ),
+        (
+            {1: [1, 3, 4, 4, 1], 2: [2, 4, 5, 2]},
+            [
+                "Truck 1: path stays at the same node between consecutive stops",
+                "Truck 1: visits 4 twice pre-dock",
+                "Demand 4 of warehouse 1 is served 2 times",
+            ],
+        ),
+        (
+            {1: [1, 3, 0, 4, 0, 1], 2: [2, 0, 5, 2]},
+            ["Truck 1: visits the crossdock 2 times"],
+        ),
+        # Post-dock service of 4 doesn't count for warehouse 2 if it doesn't dock.
+        (
+            {1: [1, 3, 0, 4, 1], 2: [2, 5, 2]},
+            [
+                "Demand 4 of warehouse 2 is served 0 times",
+            ],
+        ),
+        # ... and counts twice for warehouse 1 if it does.
+        (
+            {1: [1, 3, 4, 0, 4, 1], 2: [2, 0, 5, 2]},
+            [
+                "Demand 4 of warehouse 1 is served 2 times",
+            ],
+        ),
+    ],
+)
+def test_evaluate_violations(paths, expected):
+    result = evaluate(instance, CrossDockSolution(paths))
+    assert sorted(result.violations) == sorted(expected)
+    if result.feasible:
+        assert result.total_cost == pytest.approx(
+            sum(path_cost(instance, path) for path in paths.values())
+        )
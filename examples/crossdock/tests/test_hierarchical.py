@@ -0,0 +1,53 @@
+from itertools import chain
+
+from hypothesis import given
+from hypothesis.strategies import dictionaries, floats, integers, tuples
+import pytest
+
+from crossdock.evaluation import evaluate
+from crossdock.hierarchical import cluster_nodes, inflow_bound, solve_hierarchical
+from crossdock.instance import generate_random_instance
+from crossdock.model import construct_model, solve_model
+from .test_instance import st_instance_euclidean
+
+
+@given(
+    dictionaries(
+        keys=integers(),
+        values=tuples(
+            floats(min_value=0, max_value=1), floats(min_value=0, max_value=1)
+        ),
+    ),
+    integers(min_value=1, max_value=10),
+)
+def test_cluster_nodes(points, cluster_size):
+    """ Every node ends up in exactly one cluster, and no cluster is too big. """
+    clusters = cluster_nodes(points, points.keys(), cluster_size)
+    assert sorted(chain(*clusters)) == sorted(points)
+    assert all(1 <= len(cluster) <= cluster_size for cluster in clusters)
+
+
+@given(st_instance_euclidean)
+def test_inflow_bound(instance):
+    assert inflow_bound(instance) >= 0
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_inflow_bound_optimal(seed):
+    instance = generate_random_instance(seed, 8, 2)
+    optimal = evaluate(instance, solve_model(construct_model(instance))).total_cost
+    assert inflow_bound(instance) <= optimal + 1e-6
+
+
+@pytest.mark.parametrize("local_search", [False, True])
+def test_solve_hierarchical(local_search):
+    """ Clusters are kept small so that the subproblems solve quickly. """
+    instance = generate_random_instance(7, 40, 2)
+    result = solve_hierarchical(
+        instance, cluster_size=4, local_search=local_search, workers=2
+    )
+    evaluation = evaluate(instance, result.solution)
+    assert evaluation.feasible, evaluation.violations
+    assert evaluation.total_cost == pytest.approx(result.objective)
+    assert result.bound <= result.objective
+    assert sorted(chain(*result.clusters)) == sorted(instance.all_demand_nodes)
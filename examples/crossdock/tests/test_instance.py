@@ -1,5 +1,6 @@
 import io
 import pathlib
+import pickle
 import tempfile
 from itertools import permutations
 
@@ -14,9 +15,13 @@ from hypothesis.strategies import (
     floats,
 )
 
+import numpy as np
+import pytest
+
 from crossdock.instance import (
     CrossDockInstance,
     EuclideanDistances,
+    MatrixDistances,
     generate_random_instance,
     read_json,
 )
@@ -76,3 +81,49 @@ def test_instance_json(instance):
         instance.to_json(file_path)
         deserialised = read_json(file_path)
     assert deserialised == instance
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@given(instance=st_instance_euclidean)
+def test_instance_matrix(instance, dtype):
+    """ A matrix provider built from euclidean distances should agree with them,
+    and survive pickling and json round trips without copying the matrix. """
+    labels = sorted(instance.all_nodes)
+    with tempfile.TemporaryDirectory() as tempdir:
+        tempdir = pathlib.Path(tempdir)
+        distances = MatrixDistances.save(
+            tempdir.joinpath("matrix.npy"),
+            labels,
+            instance.distances.distance_matrix(labels),
+            dtype=dtype,
+        )
+        matrix_instance = CrossDockInstance(instance.warehouse_demand, distances)
+        for i, j in permutations(instance.all_nodes, r=2):
+            assert matrix_instance.distance(i, j) == pytest.approx(
+                instance.distance(i, j), rel=1e-6
+            )
+        assert distances.distance_matrix(labels) is distances.matrix
+        unpickled = pickle.loads(pickle.dumps(matrix_instance))
+        assert unpickled == matrix_instance
+        assert isinstance(unpickled.distances.matrix, np.memmap)
+        matrix_instance.to_json(tempdir.joinpath("instance.json"))
+        assert read_json(tempdir.joinpath("instance.json")) == matrix_instance
+
+
+def test_instance_matrix_relative(monkeypatch):
+    """ Paths relative to the working directory survive a json round trip, and
+    a matrix instance read from json can be written somewhere else. """
+    instance = generate_random_instance(0, 8, 2)
+    labels = sorted(instance.all_nodes)
+    with tempfile.TemporaryDirectory() as tempdir:
+        monkeypatch.chdir(tempdir)
+        pathlib.Path("data").mkdir()
+        distances = MatrixDistances.save(
+            "data/matrix.npy", labels, instance.distances.distance_matrix(labels)
+        )
+        matrix_instance = CrossDockInstance(instance.warehouse_demand, distances)
+        matrix_instance.to_json("data/instance.json")
+        read_instance = read_json("data/instance.json")
+        assert read_instance == matrix_instance
+        read_instance.to_json("instance.json")
+        assert read_json("instance.json") == matrix_instance
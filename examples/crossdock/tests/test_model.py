@@ -1,12 +1,18 @@
 from hypothesis import given, settings
 from itertools import cycle
+import threading
+
+import gurobipy
 import pytest
 
+from crossdock.evaluation import evaluate
+from crossdock.instance import generate_random_instance
 from crossdock.model import (
     _initialise_variables,
     construct_model,
     extract_solution,
     solve_model,
+    solve_model_iter,
 )
 from .test_instance import st_instance_euclidean
 
@@ -71,3 +77,34 @@ def test_solve_model(model):
     solve_model(model)
     # TODO check that various output conditions are hit by the input data
     # e.g. cases where trucks don't use the dock at all
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_solve_model_iter(seed):
+    """ Incumbents should improve monotonically, be feasible, and the last one
+    reported should be optimal. Small instances so this runs quickly. """
+    instance = generate_random_instance(seed, 8, 2)
+    results = list(solve_model_iter(construct_model(instance)))
+    assert results
+    objectives = [objective for _, objective, _, _ in results]
+    assert objectives == sorted(objectives, reverse=True)
+    for solution, objective, bound, elapsed in results:
+        assert bound <= objective + 1e-6
+        result = evaluate(instance, solution)
+        assert result.feasible, result.violations
+        assert result.total_cost == pytest.approx(objective)
+    optimal = solve_model(construct_model(instance))
+    assert evaluate(instance, optimal).total_cost == pytest.approx(objectives[-1])
+
+
+def test_solve_model_iter_early_stop():
+    """ Breaking out after the first incumbent should leave no solve running. """
+    model = construct_model(generate_random_instance(4, 8, 2))
+    for solution, objective, bound, elapsed in solve_model_iter(model):
+        break
+    assert objective >= bound
+    assert not any(
+        thread.name == "solve_model_iter" and thread.is_alive()
+        for thread in threading.enumerate()
+    )
+    assert model.gurobi_model.Status == gurobipy.GRB.INTERRUPTED
@@ -0,0 +1,51 @@
+import pytest
+
+import crossdock.utils
+from crossdock.instance import generate_random_instance
+from crossdock.model import construct_model, solve_model
+from crossdock.tuning import grid_configurations, random_configurations, tune
+from crossdock.utils import load_profile, save_profile
+
+space = {"params": {"MIPFocus": [0, 1, 2], "Cuts": [0, 2]}, "model": {}}
+
+
+def test_grid_configurations():
+    configurations = grid_configurations(space)
+    assert len(configurations) == 6
+    assert {"params": {"MIPFocus": 2, "Cuts": 0}, "model": {}} in configurations
+
+
+def test_random_configurations():
+    configurations = random_configurations(space, 4, seed=1)
+    assert len(configurations) == 4
+    assert all(c in grid_configurations(space) for c in configurations)
+    assert len(random_configurations(space, 100)) == 6
+
+
+def test_profile(tmp_path, monkeypatch):
+    """ Profiles round trip, and solve_model applies them by name. """
+    profile = {"params": {"SolutionLimit": 1}, "model": {}}
+    monkeypatch.setattr(crossdock.utils, "PROFILE_DIR", tmp_path)
+    save_profile("quick", profile)
+    assert load_profile("quick") == profile
+    model = construct_model(generate_random_instance(1, 8, 2))
+    solve_model(model, profile="quick")
+    assert model.gurobi_model.Params.SolutionLimit == 1
+    assert model.gurobi_model.Params.LazyConstraints == 1
+
+
+def test_tune():
+    """ Stopping at the first solution finishes with a solution limit status
+    rather than optimal, so that configuration should lose the race. """
+    instances = [generate_random_instance(seed, 8, 2) for seed in range(3)]
+    configurations = [
+        {"params": {}, "model": {}},
+        {"params": {"MIPFocus": 1}, "model": {}},
+        {"params": {"SolutionLimit": 1}, "model": {}},
+    ]
+    result = tune(instances, configurations, time_limit=5, workers=2, min_rounds=2)
+    assert 2 not in result.survivors
+    assert len([t for t in result.trials if t.configuration == 2]) == 2
+    assert all(t.optimal for t in result.trials if t.configuration != 2)
+    assert result.best["params"] in ({}, {"MIPFocus": 1})
+    assert result.best["tuning"]["instances"] == 3
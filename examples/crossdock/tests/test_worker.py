@@ -0,0 +1,95 @@
+import io
+import json
+import pathlib
+import socket
+import tempfile
+import threading
+
+import pytest
+
+from crossdock.evaluation import evaluate
+from crossdock.instance import CrossDockSolution, generate_random_instance
+from crossdock.worker import handle_request, serve_stream, socket_server, start_env
+
+
+@pytest.fixture(scope="module")
+def env():
+    return start_env()
+
+
+def check_reply(instance, reply):
+    """ Paths come back with string keys, as json requires. """
+    solution = CrossDockSolution(
+        {int(warehouse): path for warehouse, path in reply["paths"].items()}
+    )
+    result = evaluate(instance, solution)
+    assert result.feasible, result.violations
+    assert result.total_cost == pytest.approx(reply["objective"])
+
+
+def test_handle_request_payload(env):
+    instance = generate_random_instance(1, 8, 2)
+    line = json.dumps({"id": "a", "instance": instance.to_json_obj(), "threads": 1})
+    reply = json.loads(handle_request(line, env))
+    assert reply["id"] == "a"
+    assert reply["elapsed"] >= 0
+    check_reply(instance, reply)
+
+
+def test_handle_request_path(env):
+    instance = generate_random_instance(2, 8, 2)
+    with tempfile.TemporaryDirectory() as tempdir:
+        file_path = pathlib.Path(tempdir).joinpath("instance.json")
+        instance.to_json(file_path)
+        reply = json.loads(handle_request(json.dumps({"path": str(file_path)}), env))
+    assert "id" not in reply
+    check_reply(instance, reply)
+
+
+@pytest.mark.parametrize(
+    "line", ["not json", "[]", '{"id": 3}', '{"id": 3, "path": "missing.json"}']
+)
+def test_handle_request_error(env, line):
+    """ Bad requests get an error reply instead of killing the worker. """
+    reply = json.loads(handle_request(line, env))
+    assert "error" in reply
+    assert "paths" not in reply
+
+
+def test_serve_stream(env):
+    instances = [generate_random_instance(seed, 8, 2) for seed in range(3)]
+    lines = [
+        json.dumps({"id": seed, "instance": instance.to_json_obj()})
+        for seed, instance in enumerate(instances)
+    ]
+    outstream = io.StringIO()
+    serve_stream(io.StringIO("\n".join(lines + ["", "oops"]) + "\n"), outstream, env)
+    replies = [json.loads(line) for line in outstream.getvalue().splitlines()]
+    assert [reply.get("id") for reply in replies] == [0, 1, 2, None]
+    for instance, reply in zip(instances, replies):
+        check_reply(instance, reply)
+    assert "error" in replies[-1]
+
+
+def test_socket_server(env):
+    """ The server can be stopped from another thread, and cleans up after
+    itself. """
+    instance = generate_random_instance(5, 8, 2)
+    with tempfile.TemporaryDirectory() as tempdir:
+        socket_path = pathlib.Path(tempdir).joinpath("worker.sock")
+        server = socket_server(str(socket_path), env)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            with socket.socket(socket.AF_UNIX) as client:
+                client.connect(str(socket_path))
+                stream = client.makefile("rw")
+                stream.write(json.dumps({"instance": instance.to_json_obj()}) + "\n")
+                stream.flush()
+                reply = json.loads(stream.readline())
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        assert not socket_path.exists()
+    check_reply(instance, reply)
@@ -0,0 +1,106 @@
+import csv
+import dataclasses
+import json
+import logging
+import pathlib
+
+import click
+
+import crossdock.instance
+import crossdock.tuning
+import crossdock.utils
+
+logging.basicConfig(level=logging.WARNING)
+
+
+@click.command()
+@click.argument("profile-name")
+@click.option(
+    "--instances",
+    "instance_dir",
+    type=click.Path(exists=True, file_okay=False),
+    default=None,
+    help="Tune on the json instances in this directory (default: random ones).",
+)
+@click.option("--random-count", type=int, default=10)
+@click.option("--random-points", type=int, default=8)
+@click.option("--random-warehouses", type=int, default=2)
+@click.option(
+    "--space",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Json search space (default: crossdock.tuning.DEFAULT_SPACE).",
+)
+@click.option(
+    "--sample",
+    type=int,
+    default=None,
+    help="Try this many random configurations instead of the full grid.",
+)
+@click.option("--time-limit", type=float, default=10.0)
+@click.option("--workers", type=int, default=None)
+@click.option("--seed", type=int, default=0)
+@click.option(
+    "--trials-csv",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Also write every trial to this file.",
+)
+def run(
+    profile_name,
+    instance_dir,
+    random_count,
+    random_points,
+    random_warehouses,
+    space,
+    sample,
+    time_limit,
+    workers,
+    seed,
+    trials_csv,
+):
+    """ Tune solver parameters and save the winner as PROFILE_NAME, for use with
+    solver.py --profile. """
+    if instance_dir is None:
+        instances = [
+            crossdock.instance.generate_random_instance(
+                seed + i, random_points, random_warehouses
+            )
+            for i in range(random_count)
+        ]
+    else:
+        instances = [
+            crossdock.instance.read_json(file_path)
+            for file_path in sorted(pathlib.Path(instance_dir).glob("*.json"))
+        ]
+    if space is None:
+        space = crossdock.tuning.DEFAULT_SPACE
+    else:
+        with open(space) as infile:
+            space = json.load(infile)
+    if sample is None:
+        configurations = crossdock.tuning.grid_configurations(space)
+    else:
+        configurations = crossdock.tuning.random_configurations(space, sample, seed)
+
+    result = crossdock.tuning.tune(
+        instances, configurations, time_limit=time_limit, workers=workers
+    )
+
+    if trials_csv is not None:
+        with open(trials_csv, "w", newline="") as outfile:
+            writer = csv.DictWriter(
+                outfile, [field.name for field in dataclasses.fields(result.trials[0])]
+            )
+            writer.writeheader()
+            writer.writerows(dataclasses.asdict(trial) for trial in result.trials)
+    for index in sorted(result.scores, key=result.scores.__getitem__):
+        status = "" if index in result.survivors else " (dropped)"
+        click.echo(f"{result.scores[index]:8.3f}  {configurations[index]}{status}")
+    file_path = crossdock.utils.save_profile(profile_name, result.best)
+    click.echo(f"Saved profile {profile_name} to {file_path}")
+
+
+# Guarded, since trial worker processes import this module.
+if __name__ == "__main__":
+    run()